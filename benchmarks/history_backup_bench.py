@@ -0,0 +1,183 @@
+"""
+历史记录备份工具的微基准测试
+
+用合成的长对话比较聊天JSON的解析速度:
+    python benchmarks/history_backup_bench.py --chats 200 --messages 400
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+
+from history_backup import ImageStore, Tools, decode_chat_json, get_json_decoder, iter_chat_markdown, write_chunks_if_changed
+
+
+def make_chat(messages: int) -> dict:
+    """生成一个带分支历史的合成聊天"""
+    history = {}
+    message_list = []
+    parent = None
+    for i in range(messages):
+        message = {
+            "id": f"m{i}",
+            "parentId": parent,
+            "childrenIds": [f"m{i + 1}"] if i + 1 < messages else [],
+            "role": "user" if i % 2 == 0 else "assistant",
+            "model": "gpt-x",
+            "content": f"消息 {i}: " + "lorem ipsum dolor sit amet " * 40,
+            "timestamp": 1700000000 + i,
+        }
+        if message["role"] == "assistant":
+            # 助手消息通常带有用量统计和检索来源，渲染时不需要
+            message["info"] = {"prompt_tokens": 1000 + i, "completion_tokens": 200, "total_duration": 123456789}
+            message["sources"] = [
+                {"source": {"name": f"doc{j}.pdf"}, "document": ["检索片段 " * 60], "metadata": [{"page": j}]}
+                for j in range(3)
+            ]
+        history[message["id"]] = message
+        message_list.append(message)
+        parent = message["id"]
+    return {
+        "title": "benchmark",
+        "history": {"currentId": parent, "messages": history},
+        "messages": message_list,
+    }
+
+
+def measure(func, rows, repeat: int) -> float:
+    """返回多次运行中最快的一次耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for row in rows:
+            func(row)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_json_decode(chats: int, messages: int, repeat: int):
+    """比较str+json.loads与bytes+快速解析器的解析耗时"""
+    rows = [json.dumps(make_chat(messages), ensure_ascii=False).encode() for _ in range(chats)]
+    size_mb = sum(len(row) for row in rows) / 1024 / 1024
+
+    # 原来的读取方式: sqlite3把TEXT列解码为str，再交给json.loads
+    baseline = measure(lambda row: json.loads(row.decode()), rows, repeat)
+    print(f"json_decode: {chats} 个聊天，共 {size_mb:.1f} MB")
+    print(f"  {'str + json':<18} {baseline * 1000:8.1f} ms")
+
+    for name in ("json", "orjson", "msgspec"):
+        try:
+            _, decoder = get_json_decoder(name)
+        except Exception:
+            print(f"  {'bytes + ' + name:<18} 未安装")
+            continue
+        elapsed = measure(lambda row: decode_chat_json(row, decoder), rows, repeat)
+        print(f"  {'bytes + ' + name:<18} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.2f}x")
+
+
+def bench_chat_parse(chats: int, messages: int, repeat: int):
+    """比较在Python中解析完整聊天与用SQLite JSON1只取出渲染字段的耗时"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = f"{tmp}/webui.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE chat (id TEXT PRIMARY KEY, user_id TEXT, title TEXT, chat TEXT, created_at INTEGER, updated_at INTEGER)")
+        chat = json.dumps(make_chat(messages), ensure_ascii=False)
+        conn.executemany(
+            "INSERT INTO chat VALUES (?, 'u1', 'benchmark', ?, ?, ?)",
+            [(f"c{i}", chat, 1700000000 + i, 1700000000 + i) for i in range(chats)]
+        )
+        conn.commit()
+        conn.close()
+
+        print(f"chat_parse: {chats} 个聊天，每个 {messages} 条消息")
+        results = {}
+        for mode in ("python", "sqlite"):
+            tools = Tools()
+            tools.valves = tools.Valves(db_path=db_path, chat_parse_mode=mode, db_stream_threshold_mb=0)
+            source = tools.get_chat_source()
+            read_all = lambda _: sum(
+                len(chat["history"]["messages"]) if "history" in chat else len(list(chat["messages"]))
+                for chat in source.read_chats_from_db("u1")
+            )
+            results[mode] = measure(read_all, [None], repeat)
+            speedup = results["python"] / results[mode]
+            print(f"  {mode:<18} {results[mode] * 1000:8.1f} ms  {speedup:5.2f}x")
+
+
+def legacy_render(chat: dict, path: Path):
+    """原来的渲染方式: 逐条拼接完整的文档字符串，再一次性写入文件"""
+    markdown = f"# {chat['title']}\n\n"
+    markdown += "---\n"
+    markdown += f"创建时间: {chat['created_at']}\n"
+    markdown += f"更新时间: {chat['updated_at']}\n"
+    model_name = "助手"
+    for msg in sorted(chat['messages'], key=lambda x: x.get('timestamp', 0)):
+        content = msg.get('content', '')
+        if msg['role'] == 'user':
+            markdown += f"## 🧑 用户\n\n{content}\n\n"
+        elif msg['role'] == 'assistant':
+            model_name = msg.get('modelName', model_name)
+            markdown += f"## 🤖 {model_name}\n\n{content}\n\n"
+    data = markdown.encode('utf-8')
+    hashlib.sha256(data).hexdigest()
+    path.write_bytes(data)
+
+
+def measure_peak(func) -> tuple:
+    """返回一次运行的耗时（秒）和Python内存分配的峰值（字节）"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_render(messages: int, repeat: int):
+    """比较拼接字符串与分段写入缓冲文件两种渲染方式的耗时和内存峰值"""
+    chat = make_chat(messages)
+    chat.update(created_at=1700000000, updated_at=1700000000)
+    with tempfile.TemporaryDirectory() as tmp:
+        image_store = ImageStore(Path(tmp) / "images")
+        path = Path(tmp) / "chat.md"
+        
+        def stream_render():
+            # 先删除上次的输出，测量的是完整写入而不是与相同内容的比较
+            path.unlink(missing_ok=True)
+            write_chunks_if_changed(iter_chat_markdown(chat, image_store, tmp), path)
+        
+        renderers = {
+            "concat": lambda: legacy_render(chat, path),
+            "stream": stream_render,
+        }
+        print(f"render: 1 个聊天，{messages} 条消息")
+        baseline = None
+        for name, render in renderers.items():
+            elapsed = measure(lambda _: render(), [None], repeat)
+            _, peak = measure_peak(render)
+            baseline = baseline or elapsed
+            print(f"  {name:<18} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.2f}x  峰值 {peak / 1024 / 1024:6.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=200, help="合成聊天的数量")
+    parser.add_argument("--messages", type=int, default=400, help="每个聊天的消息数量")
+    parser.add_argument("--repeat", type=int, default=3, help="每项测试的重复次数")
+    args = parser.parse_args()
+    bench_json_decode(args.chats, args.messages, args.repeat)
+    bench_chat_parse(args.chats, args.messages, args.repeat)
+    bench_render(args.messages * 20, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""内联base64图片的提取"""
+import base64
+
+import pytest
+
+from history_backup import ImageStore, extract_inline_images
+
+DATA = b'\x89PNG' + bytes(range(256)) * 2
+ENCODED = base64.b64encode(DATA).decode()
+WRAPPED = '\n'.join(ENCODED[i:i + 76] for i in range(0, len(ENCODED), 76))
+
+
+@pytest.fixture
+def image_store(tmp_path):
+    store = ImageStore(tmp_path / "images")
+    store.load()
+    return store
+
+
+def extract(content, image_store):
+    refs = []
+    out = extract_inline_images(content, image_store, refs, 'L')
+    return out, refs
+
+
+def saved_bytes(image_store, refs):
+    return [(image_store.images_path / ref).read_bytes() for ref in refs]
+
+
+@pytest.mark.parametrize("content, suffix", [
+    (f"![](data:image/png;base64,{ENCODED})", ")"),
+    (f"![](data:image/png;base64,{WRAPPED})\nafter", ")\nafter"),
+    ("![](data:image/png;base64," + '\r\n  '.join(WRAPPED.split('\n')) + "\n)", "\n)"),
+    (f'<img src="data:image/png;base64,{WRAPPED}">', '">'),
+])
+def test_extracts_whole_image(content, suffix, image_store):
+    out, refs = extract(content, image_store)
+    assert out.endswith(f"L/{refs[0]}{suffix}")
+    assert saved_bytes(image_store, refs) == [DATA]
+
+
+@pytest.mark.parametrize("content", [
+    # 没有结尾的 ) " '，无法确定折断的base64在哪一行结束
+    f"data:image/png;base64,{WRAPPED}\nmore text",
+    # 单行的base64之后另起一行的文字以base64字符开头
+    f"data:image/png;base64,{ENCODED}\nnext line",
+    f"see data:image/png;base64,{ENCODED[:8]}\nfoo bar)",
+    f"data:image/png;base64,{ENCODED[:76]}\n  {ENCODED[76:152]}",
+])
+def test_leaves_ambiguous_wrapped_data(content, image_store):
+    out, refs = extract(content, image_store)
+    assert out == content
+    assert refs == []
+
+
+def test_padded_line_ends_image(image_store):
+    encoded = base64.b64encode(b'\x89PNG!').decode()
+    assert encoded.endswith('=')
+    content = f"data:image/png;base64,{encoded}\nnext line"
+    out, refs = extract(content, image_store)
+    assert out == f"L/{refs[0]}\nnext line"
+    assert saved_bytes(image_store, refs) == [b'\x89PNG!']
@@ -0,0 +1,71 @@
+"""分块读取JSON数组的JsonStreamReader"""
+import io
+import json
+
+import pytest
+
+from history_backup import JsonStreamReader
+
+CHUNK_SIZES = [1, 2, 3, 7, 64]
+
+MESSAGES = [
+    {"id": "a", "content": "引号\"和反斜杠\\，换行\n和\\u0041", "parentId": None},
+    {"id": "b", "content": "转义在块边界: \\\\\\\"\\/\\b\\f\\r\\t", "files": [{"name": "x]}{[,"}]},
+    {"id": "c", "nested": {"list": [[1, [2, {"deep": [3.5, -4e3]}]], {}], "empty": []}, "flag": True},
+    {"id": "d", "emoji": "😀", "value": False, "none": None},
+    "字符串元素",
+    12345,
+    [],
+]
+
+
+def read(data, key, chunk_size):
+    reader = JsonStreamReader(io.BytesIO(data), chunk_size=chunk_size)
+    return list(reader.iter_array(key))
+
+
+def encode(obj, **kwargs):
+    return json.dumps(obj, **kwargs).encode()
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("dump_kwargs", [{}, {"ensure_ascii": False}, {"indent": 2}, {"separators": (",", ":")}])
+def test_matches_json_loads(chunk_size, dump_kwargs):
+    chat = {
+        "title": "在 \"messages\" 之前的键",
+        "history": {"messages": {"a": {"content": "[{\"messages\": []}]"}}, "currentId": "a"},
+        "messages": MESSAGES,
+        "tags": ["messages"],
+    }
+    data = encode(chat, **dump_kwargs)
+    assert read(data, "messages", chunk_size) == json.loads(data)["messages"]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_skips_values_before_key(chunk_size):
+    data = b' { "n" : -1.5e+2 , "t" : true , "z" : null , "s" : "\\"]" , "messages" : [ 1 , {"a" : [ ] } ] } '
+    assert read(data, "messages", chunk_size) == json.loads(data)["messages"]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("chat", [
+    {"title": "没有消息"},
+    {"messages": {"a": 1}},
+    {"messages": None},
+    {"history": {"messages": [1, 2]}},
+    {},
+])
+def test_missing_key(chunk_size, chat):
+    assert read(encode(chat), "messages", chunk_size) == []
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_truncated_json(chunk_size):
+    data = encode({"messages": MESSAGES})[:-5]
+    with pytest.raises(Exception):
+        read(data, "messages", chunk_size)
+
+
+def test_not_an_object():
+    with pytest.raises(Exception):
+        read(b"[1, 2]", "messages", 4)
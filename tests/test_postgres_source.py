@@ -0,0 +1,122 @@
+"""用测试连接检查PostgresChatSource生成的查询和对结果的处理"""
+import json
+
+from history_backup import PostgresChatSource
+
+
+class FakeCursor:
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+        self.itersize = None
+        self.rows = []
+
+    def execute(self, query, params):
+        self.conn.executed.append((self.name, query, list(params)))
+        self.rows = list(self.conn.results.pop(0))
+
+    def fetchall(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """按顺序为每次execute返回预设的结果，记录执行的查询"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+        self.cursors = []
+        self.closed = False
+
+    def cursor(self, name=None):
+        cursor = FakeCursor(self, name)
+        self.cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        self.closed = True
+
+
+def make_source(results, **kwargs):
+    conn = FakeConnection(results)
+    urls = []
+
+    def connect(url):
+        urls.append(url)
+        return conn
+
+    return PostgresChatSource("postgresql://db", connect=connect, json_decoder="json", **kwargs), conn, urls
+
+
+def normalize(query):
+    return " ".join(query.split())
+
+
+def test_fingerprint():
+    source, conn, urls = make_source([[(3, 1700000200, 5100000300.0)]])
+    assert source.read_chat_fingerprint("u1") == [3, 1700000200, 5100000300.0]
+    name, query, params = conn.executed[0]
+    assert name is None
+    assert normalize(query).endswith("FROM chat WHERE user_id = %s")
+    assert params == ["u1"]
+    assert urls == ["postgresql://db"]
+    assert conn.closed
+
+
+def test_fingerprint_all_users():
+    source, conn, _ = make_source([[(0, None, 0.0)]])
+    assert source.read_chat_fingerprint(None) == [0, None, 0.0]
+    assert "WHERE" not in conn.executed[0][1]
+    assert conn.executed[0][2] == []
+
+
+def test_read_chats_in_chat_ids_order():
+    history = {
+        "currentId": "m2",
+        "messages": {
+            "m1": {"id": "m1", "parentId": None, "childrenIds": ["m2"], "role": "user", "content": "问"},
+            "m2": {"id": "m2", "parentId": "m1", "childrenIds": [], "role": "assistant", "content": "答"},
+        },
+    }
+    messages = [{"role": "user", "content": "旧格式"}]
+    rows = [
+        ("c2", "有消息树", 1, 20, json.dumps(history), None),
+        ("c1", "旧聊天", 2, 10, json.dumps({"messages": {}}), json.dumps(messages)),
+        ("c3", "空聊天", 3, 30, None, None),
+    ]
+    source, conn, _ = make_source([rows], fetch_size=0)
+    chats = list(source.read_chats_from_db("u1", since=5, chat_ids=["c2", "c1", "c3"]))
+
+    assert [chat["id"] for chat in chats] == ["c2", "c1", "c3"]
+    assert chats[0] == {"id": "c2", "title": "有消息树", "created_at": 1, "updated_at": 20, "history": history}
+    assert chats[1]["messages"] == messages and "history" not in chats[1]
+    assert chats[2]["messages"] == []
+
+    name, query, params = conn.executed[0]
+    query = normalize(query)
+    # 命名游标在服务器端分批读取，chat_ids优先于水位线
+    assert name == "history_backup_chats"
+    assert conn.cursors[0].itersize == 1
+    assert "WHERE user_id = %s AND id = ANY(%s)" in query
+    assert "updated_at >=" not in query
+    assert query.endswith("ORDER BY array_position(%s::text[], id::text)")
+    assert params == ["u1", ["c2", "c1", "c3"], ["c2", "c1", "c3"]]
+    # chat列只在子查询中转换一次
+    assert query.count("chat::json") == 1
+    assert conn.closed
+
+
+def test_read_chats_since_watermark():
+    source, conn, _ = make_source([[]])
+    assert list(source.read_chats_from_db(None, since=100)) == []
+    _, query, params = conn.executed[0]
+    query = normalize(query)
+    assert "WHERE updated_at >= %s OFFSET 0" in query
+    assert query.endswith("ORDER BY updated_at DESC")
+    assert params == [100]